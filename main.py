@@ -1,20 +1,29 @@
 # main.py 
 
 import streamlit as st
-from groq import Groq
-import PyPDF2
-import io
 import os
+import asyncio
+import threading
 import time
 import logging
-import json
+import orjson
+import fastjsonschema
 import re
-from dotenv import load_dotenv
-from typing import Optional, Dict, List, Tuple, Any
+import hashlib
+import concurrent.futures
+from cachetools import TTLCache
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple, Any
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq
 
 # --- Configuration & Initialization ---
 
-load_dotenv()
+# python-dotenv is only needed for local development, where a .env file sits next to this script
+_DOTENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_DOTENV_PATH):
+    from dotenv import load_dotenv
+    load_dotenv(_DOTENV_PATH)
 
 log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
@@ -31,51 +40,202 @@ GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama3-70b-8192")
 MIN_JD_LENGTH = 100
 MIN_RESUME_LENGTH = 150
 
+# The analysis is split into independent sections that are requested from Groq concurrently
+ANALYSIS_SECTIONS = {
+    "score": ("match_score", "score_rationale", "key_qualifications_match"),
+    "gaps": ("strengths", "missing_skills_requirements", "areas_for_improvement"),
+    "keywords": ("keyword_analysis", "suggested_resume_improvements"),
+}
+ANALYSIS_KEYS = tuple(key for keys in ANALYSIS_SECTIONS.values() for key in keys)
+# Factories for the value used when a key is missing from the response (fresh objects per repair)
+_DEFAULTS = {
+    "match_score": lambda: "N/A",
+    "score_rationale": lambda: "N/A",
+    "key_qualifications_match": lambda: "N/A",
+    "missing_skills_requirements": list,
+    "strengths": list,
+    "areas_for_improvement": list,
+    "suggested_resume_improvements": list,
+    "keyword_analysis": lambda: {"missing_jd_keywords": []},
+}
+# Compiled once at import; a merged analysis that passes needs no repair
+_VALIDATE_ANALYSIS = fastjsonschema.compile({
+    "type": "object",
+    "required": list(ANALYSIS_KEYS),
+    "properties": {
+        "match_score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "keyword_analysis": {"type": "object", "required": ["missing_jd_keywords"]},
+    },
+})
+# Length limits stated in the prompt; the per-section token caps below are derived from them
+LIST_MAX_ITEMS = 5
+LIST_ITEM_MAX_WORDS = 40
+# ~4/3 tokens per word plus quoting/commas, and a fixed allowance for keys and braces per section
+_LIST_MAX_TOKENS = LIST_MAX_ITEMS * (LIST_ITEM_MAX_WORDS * 4 // 3 + 10)
+_SECTION_OVERHEAD_TOKENS = 150
+# A section at its prompt limits fits under its first cap; a truncated section is retried once with double.
+# The score section's key_qualifications_match is a free-length markdown string, so it keeps a flat cap.
+SECTION_MAX_TOKENS = {
+    "score": 1200,
+    "gaps": 3 * _LIST_MAX_TOKENS + _SECTION_OVERHEAD_TOKENS,
+    "keywords": 2 * _LIST_MAX_TOKENS + _SECTION_OVERHEAD_TOKENS,
+}
+SECTION_RETRY_MAX_TOKENS = {section: 2 * max_tokens for section, max_tokens in SECTION_MAX_TOKENS.items()}
+# Greedy decoding trades some variety in the wording for repeatable results, which keeps cached analyses consistent
+GROQ_TEMPERATURE = 0.0
+ANALYSIS_POLL_SECONDS = 0.2
+EXTRACTED_PREVIEW_CHARS = 4000
+# Input caps for the prompt (~4 chars per token): prefill time grows with input length
+MAX_RESUME_PROMPT_CHARS = 8000
+MAX_JD_PROMPT_CHARS = 4000
+
+# Runs of two or more blank lines; [ \t] instead of \s keeps the engine from re-matching newlines
+_MULTI_BLANK = re.compile(r'\n[ \t]*\n(?:[ \t]*\n)+')
+
+# All static instructions live in the per-section system messages, so every request for a
+# section starts with the same prefix and only the user message (resume + JD) varies
+_SYSTEM_PROMPT_HEAD = """You are an expert ATS and recruiter resume analyzer giving critical, actionable feedback.
+Analyze the resume in the user message against the job description that follows it.
+Return a JSON object with these keys:
+"""
+_SYSTEM_PROMPT_END = (f"All list items are strings. Keep each list to at most {LIST_MAX_ITEMS} items "
+                      f"and each list item to at most {LIST_ITEM_MAX_WORDS} words.")
+_KEY_INSTRUCTIONS = {
+    "match_score": '- "match_score": integer 0-100, realistic overall alignment.',
+    "score_rationale": '- "score_rationale": string, main reasons for the score.',
+    "key_qualifications_match": '- "key_qualifications_match": string, markdown bullets "* Requirement: Matched/Partially Matched/Missing - Justification" for the most critical JD qualifications.',
+    "missing_skills_requirements": '- "missing_skills_requirements": list, specific JD skills/tools/certifications/experience missing or thin in the resume.',
+    "strengths": '- "strengths": list, the resume\'s most relevant strengths for this JD.',
+    "areas_for_improvement": '- "areas_for_improvement": list, actionable areas to better match this JD.',
+    "suggested_resume_improvements": '- "suggested_resume_improvements": list, concrete edits to the resume text (e.g. quantify X, add JD keyword Y).',
+    "keyword_analysis": '- "keyword_analysis": object with one key "missing_jd_keywords": list of the most important JD keywords absent from the resume.',
+}
+_SECTION_SYSTEM_MSGS = {
+    section: {"role": "system", "content": "".join((
+        _SYSTEM_PROMPT_HEAD, "".join(f"{_KEY_INSTRUCTIONS[key]}\n" for key in keys), _SYSTEM_PROMPT_END))}
+    for section, keys in ANALYSIS_SECTIONS.items()
+}
+
 # --- Groq Client Initialization ---
 
 @st.cache_resource
 def initialize_groq_client():
-    """Initialize and return Groq client, handle missing API key."""
+    """Initialize and return async Groq client, handle missing API key."""
     if not GROQ_API_KEY:
         logger.error("GROQ_API_KEY environment variable not set.")
         return None
     try:
-        logger.info("Initializing Groq client.")
-        client = Groq(api_key=GROQ_API_KEY)
+        logger.info("Initializing async Groq client.")
+        # Imported here so the groq/httpx/pydantic stack loads on first use, not at worker start
+        from groq import AsyncGroq, DefaultAioHttpClient
+        # aiohttp transport: pooled keep-alive connections on the shared background event loop
+        client = AsyncGroq(api_key=GROQ_API_KEY, http_client=DefaultAioHttpClient())
         return client
     except Exception as e:
         logger.exception("Failed to initialize Groq client.")
         return None
 
+
+@st.cache_resource
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Start the background event loop that runs all async Groq requests.
+
+    The cached AsyncGroq client keeps a connection pool bound to the loop it first
+    ran on, so every request goes through this one long-lived loop instead of a
+    fresh `asyncio.run` loop per rerun.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="groq-event-loop", daemon=True).start()
+    logger.info("Started background event loop for Groq requests.")
+    return loop
+
+
+def _submit_async(coro) -> concurrent.futures.Future:
+    """Schedule a coroutine on the background event loop and return its future."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop())
+
+
+async def _ping_groq(_client: "AsyncGroq") -> None:
+    """Send a one-token completion so the connection and model route are warm for the first analysis."""
+    start_time = time.time()
+    await _client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=1,
+    )
+    logger.info("Groq warmup request finished in %.2f seconds.", time.time() - start_time)
+
+
+def _log_warmup_failure(future: concurrent.futures.Future) -> None:
+    """Log a failed warmup request; the analysis itself will surface any real problem."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Groq warmup request failed: %s", future.exception())
+
+
+@st.cache_resource(show_spinner=False)
+def warm_up_groq(_client: "AsyncGroq") -> concurrent.futures.Future:
+    """Start a background warmup request once per process, without waiting for it.
+
+    The ping runs on the shared event loop through the cached client, so the TLS handshake
+    and pooled connection it sets up are the ones the first real analysis reuses.
+    """
+    logger.info("Warming up Groq endpoint with model %s.", GROQ_MODEL)
+    future = _submit_async(_ping_groq(_client))
+    future.add_done_callback(_log_warmup_failure)
+    return future
+
+
+@st.cache_resource
+def _analysis_cache() -> Tuple[TTLCache, threading.Lock]:
+    """Return the process-wide cache of parsed analyses and the lock guarding it."""
+    return TTLCache(maxsize=128, ttl=3600), threading.Lock()
+
 # --- Helper Functions ---
 
-def extract_text_from_pdf(pdf_file_obj: io.BytesIO) -> Optional[str]:
-    """Extract text from an uploaded PDF file object (BytesIO)."""
-    # (Function remains the same as previous version)
-    extracted_text = ""
+_PDF = None
+
+
+def _pdf_module():
+    """Import PyMuPDF on first use and keep it for later calls."""
+    global _PDF
+    if _PDF is None:
+        import fitz  # PyMuPDF
+        _PDF = fitz
+    return _PDF
+
+
+def extract_text_from_pdf(pdf_data: bytes) -> Optional[str]:
+    """Extract text from the raw bytes of an uploaded PDF file."""
+    fitz = _pdf_module()
+    parts: List[str] = []
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file_obj)
-        num_pages = len(pdf_reader.pages)
-        logger.info(f"Reading PDF with {num_pages} pages.")
-        for i, page in enumerate(pdf_reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text:
-                    extracted_text += page_text + "\n"
-                else:
-                     logger.warning(f"No text extracted from page {i+1}.")
-            except Exception as page_e:
-                 logger.warning(f"Could not extract text from page {i+1}: {page_e}")
-        if not extracted_text:
+        # The context manager closes the document on every path, including errors mid-read
+        with fitz.open(stream=pdf_data, filetype="pdf") as doc:
+            if doc.needs_pass:
+                st.error("Error reading PDF: The file is password-protected.")
+                logger.error("PDF is encrypted and requires a password.")
+                return None
+            logger.info("Reading PDF with %d pages.", doc.page_count)
+            for i, page in enumerate(doc):
+                try:
+                    page_text = page.get_text("text")
+                    if page_text.strip():
+                        parts.append(page_text)
+                    else:
+                         logger.warning("No text extracted from page %d.", i + 1)
+                except Exception as page_e:
+                     logger.warning("Could not extract text from page %d: %s", i + 1, page_e)
+        if not parts:
              logger.warning("No text extracted from any page of the PDF.")
              st.warning("Could not extract any text from the PDF. It might be image-based or corrupted.")
              return None
-        logger.info(f"Successfully extracted text from PDF (approx {len(extracted_text)} chars).")
-        cleaned_text = re.sub(r'\n\s*\n', '\n\n', extracted_text).strip()
+        logger.info("Successfully extracted text from PDF (approx %d chars).", sum(map(len, parts)))
+        extracted_text = "\n".join(parts)
+        cleaned_text = _MULTI_BLANK.sub('\n\n', extracted_text).strip()
         return cleaned_text
-    except PyPDF2.errors.PdfReadError as e:
-        st.error(f"Error reading PDF: Invalid or potentially encrypted PDF file. ({e})")
-        logger.error(f"PyPDF2 PdfReadError: {e}", exc_info=True)
+    except fitz.FileDataError as e:
+        st.error(f"Error reading PDF: Invalid or corrupted PDF file. ({e})")
+        logger.error("PyMuPDF FileDataError: %s", e, exc_info=True)
         return None
     except Exception as e:
         st.error(f"An unexpected error occurred during PDF text extraction: {e}")
@@ -83,117 +243,385 @@ def extract_text_from_pdf(pdf_file_obj: io.BytesIO) -> Optional[str]:
         return None
 
 
-def analyze_resume_groq(_client: Groq, resume_text: str, job_description: str) -> Optional[Dict[str, Any]]:
-    """Analyze resume against job description using Groq API, expecting JSON output."""
-    # (Function remains the same as previous version)
+@st.cache_data(max_entries=16, show_spinner=False)
+def _extract_text_cached(pdf_hash: str, _pdf_file: Any) -> Optional[str]:
+    """Extract text from an uploaded PDF, reusing the result for identical file contents.
+
+    Only `pdf_hash` (a digest of the file bytes) is hashed by Streamlit; the underscore-prefixed
+    upload is read only on a cache miss, so hits never copy or re-hash the PDF.
+    """
+    logger.info("PDF extraction cache miss; parsing uploaded file.")
+    return extract_text_from_pdf(_pdf_file.getvalue())
+
+
+class AnalysisResponseError(Exception):
+    """Raised when a Groq response cannot be turned into an analysis result."""
+
+
+def _compact_text(text: str, max_chars: int) -> Tuple[str, bool]:
+    """Shrink text for the prompt: collapse whitespace, drop blank and repeated lines, cap length.
+
+    Repeated page headers/footers and contact lines are common in extracted resumes and only
+    add prefill tokens; the first occurrence of each line is kept, in order. Text over the cap
+    is cut at the last line break before it. Returns the text and whether it was truncated.
+    """
+    lines = dict.fromkeys(" ".join(line.split()) for line in text.splitlines())
+    lines.pop("", None)
+    compacted = "\n".join(lines)
+    if len(compacted) <= max_chars:
+        return compacted, False
+    cut = compacted.rfind("\n", 0, max_chars + 1)
+    return compacted[:cut if cut > 0 else max_chars], True
+
+
+def _build_prompt(resume_text: str, job_description: str) -> str:
+    """Build the user message carrying the two per-request inputs, shared by every section."""
+    return f"Resume:\n{resume_text}\n\nJob Description:\n{job_description}"
+
+
+async def _stream_completion(_client: "AsyncGroq", section: str, prompt: str, model: str, buffer: List[str], max_tokens: int) -> Tuple[str, Optional[str]]:
+    """Stream one Groq completion into `buffer`, returning the full content and finish reason."""
+    start_time = time.time()
+    logger.info("Sending request to Groq API with model %s (max_tokens=%d)...", model, max_tokens)
+    stream = await _client.chat.completions.create(
+        model=model,
+        messages=[
+            _SECTION_SYSTEM_MSGS[section],
+            {"role": "user", "content": prompt}
+        ],
+        temperature=GROQ_TEMPERATURE,
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"},
+        stream=True,
+    )
+    finish_reason = None
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        if chunk.choices[0].delta.content:
+            if not buffer:
+                logger.info("First Groq token received after %.2f seconds.", time.time() - start_time)
+            buffer.append(chunk.choices[0].delta.content)
+        if chunk.choices[0].finish_reason:
+            finish_reason = chunk.choices[0].finish_reason
+    end_time = time.time()
+    api_duration = end_time - start_time
+    content = "".join(buffer)
+    logger.info("Groq API response received in %.2f seconds (%d chars, finish_reason=%s).", api_duration, len(content), finish_reason)
+    return content, finish_reason
+
+
+async def _request_analysis(_client: "AsyncGroq", section: str, prompt: str, model: str, buffer: List[str]) -> str:
+    """Stream the Groq response for a prompt into `buffer`, retrying once with more room if truncated."""
+    max_tokens = SECTION_MAX_TOKENS[section]
+    content, finish_reason = await _stream_completion(_client, section, prompt, model, buffer, max_tokens)
+    if finish_reason == "length":
+        retry_max_tokens = SECTION_RETRY_MAX_TOKENS[section]
+        logger.warning("Groq %s response hit max_tokens=%d; retrying with %d.", section, max_tokens, retry_max_tokens)
+        buffer.clear()
+        content, _ = await _stream_completion(_client, section, prompt, model, buffer, retry_max_tokens)
+    return content
+
+
+async def _request_section(_client: "AsyncGroq", section: str, prompt: str, model: str, buffer: List[str],
+                           cache_key: str, cache: TTLCache, cache_lock: threading.Lock) -> Dict[str, Any]:
+    """Request and decode one analysis section, caching it as soon as it succeeds.
+
+    Caching here on the event loop, instead of when the script collects the job, keeps the
+    completion even if the session that asked for it is gone or has moved on.
+    """
+    section_json = _load_section(section, await _request_analysis(_client, section, prompt, model, buffer))
+    with cache_lock:
+        cache[cache_key] = section_json
+    return section_json
+
+
+async def _gather(*coros) -> List[Any]:
+    """Await coroutines concurrently, returning exceptions in place of their results."""
+    return await asyncio.gather(*coros, return_exceptions=True)
+
+
+def _scan_json_object(text: str) -> Tuple[int, List[Tuple[int, int]], int, Optional[Tuple[int, int]]]:
+    """Scan the first JSON object in `text` in a single pass, without backtracking.
+
+    Tracks nesting depth and string/escape state so braces and commas inside strings are
+    ignored. Returns `(start, member_spans, end, open_list)` where `member_spans` are the
+    `(from, to)` slices of each complete top-level `"key": value` member, and `start`/`end` are
+    the indices of the opening and matching closing brace (-1 when absent or not yet received).
+    `open_list` is the slice of a trailing member whose array value is still streaming, up to
+    its last complete item (None when there is no such item yet).
+    """
+    spans: List[Tuple[int, int]] = []
+    start = text.find('{')
+    if start == -1:
+        return start, spans, -1, None
+    depth = 0
+    in_string = escaped = in_list = False
+    member_start = start + 1
+    item_end = -1
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped: escaped = False
+            elif ch == '\\': escaped = True
+            elif ch == '"': in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{' or ch == '[':
+            in_list = in_list or (ch == '[' and depth == 1)
+            depth += 1
+        elif ch == '}' or ch == ']':
+            depth -= 1
+            if depth == 1:
+                in_list = False
+            elif depth == 0:
+                spans.append((member_start, i))
+                return start, spans, i, None
+        elif ch == ',' and depth == 1:
+            spans.append((member_start, i))
+            member_start = i + 1
+            item_end = -1
+        elif ch == ',' and depth == 2 and in_list:
+            item_end = i
+    return start, spans, -1, (member_start, item_end) if in_list and item_end != -1 else None
+
+
+def _parse_completed_fields(text: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Parse the complete parts of a possibly incomplete JSON object.
+
+    Returns the top-level fields whose values are complete, and separately the completed
+    items of a list field that is still streaming (e.g. `{"strengths": [...]}` so far).
+    """
+    fields: Dict[str, Any] = {}
+    open_fields: Dict[str, Any] = {}
+    _, member_spans, _, open_list = _scan_json_object(text)
+    for member_from, member_to in member_spans:
+        _add_member(fields, text[member_from:member_to])
+    if open_list is not None:
+        _add_member(open_fields, text[open_list[0]:open_list[1]] + "]")
+    return fields, open_fields
+
+
+def _add_member(fields: Dict[str, Any], member: str) -> None:
+    """Decode a single `"key": value` JSON member into `fields`, ignoring malformed ones."""
+    try:
+        fields.update(orjson.loads("{" + member + "}"))
+    except ValueError:
+        pass
+
+
+def _render_partial_analysis(job: Dict[str, Any]) -> None:
+    """Show the analysis fields of an in-flight job that have finished streaming so far."""
+    fields: Dict[str, Any] = {}
+    for section_json in job["results"].values():
+        fields.update(section_json)
+    open_fields: Dict[str, Any] = {}
+    previews = job["previews"]
+    for section, buffer in job["buffers"].items():
+        # Re-scan a stream whenever it has changed since the last poll (grown, or restarted after
+        # a truncation retry) so a finished section's final members show up; otherwise reuse the last parse
+        parsed_chunks, section_fields, section_open = previews.get(section, (0, {}, {}))
+        grown = len(buffer) - parsed_chunks
+        if grown != 0:
+            parsed_chunks = len(buffer)
+            section_fields, section_open = _parse_completed_fields("".join(buffer[:parsed_chunks]))
+            previews[section] = (parsed_chunks, section_fields, section_open)
+        fields.update(section_fields)
+        open_fields.update(section_open)
+    lines = []
+    score = fields.get("match_score")
+    if score is not None:
+        lines.append(f"**Overall Match Score:** {score}/100")
+    if fields.get("score_rationale"):
+        lines.append(f"**Rationale:** {fields['score_rationale']}")
+    strengths = fields.get("strengths") or open_fields.get("strengths")
+    if isinstance(strengths, list) and strengths:
+        lines.append("**Strengths:**\n" + "\n".join(f"- {item}" for item in strengths))
+    lines.append(f"_Received {len(fields)} of {len(ANALYSIS_KEYS)} analysis fields..._")
+    st.markdown("\n\n".join(lines))
+
+
+def _load_json_object(response_content: str) -> Dict[str, Any]:
+    """Decode one section response from Groq into a dict.
+
+    Raises AnalysisResponseError with a user-facing message instead of returning None,
+    so failed responses are never stored in the analysis cache.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Raw Groq response content start:\n%s...", response_content[:500])
+
+    # JSON mode guarantees a parseable document; only the shape still needs checking
+    try:
+        section_json = orjson.loads(response_content)
+    except orjson.JSONDecodeError as json_e:
+        logger.error("Failed to decode Groq response as JSON. Raw response was:\n%s", response_content, exc_info=True)
+        raise AnalysisResponseError(f"Failed to parse the analysis response from the AI. Please check the format or try again. Error: {json_e}") from json_e
+    if not isinstance(section_json, dict):
+        logger.error("Groq response is not a JSON object. Raw response was:\n%s", response_content)
+        raise AnalysisResponseError("Could not find a valid JSON object in the AI response.")
+    logger.info("Successfully parsed JSON response from Groq.")
+    return section_json
+
+
+def _load_section(section: str, response_content: str) -> Dict[str, Any]:
+    """Decode one section response and check it carries every key that section asked for.
+
+    JSON mode only guarantees valid JSON, so a reply such as `{}` is rejected here rather than
+    being cached and later repaired with placeholder values.
+    """
+    section_json = _load_json_object(response_content)
+    missing_keys = [key for key in ANALYSIS_SECTIONS[section] if key not in section_json]
+    if missing_keys:
+        logger.error("Groq %s section response is missing keys %s. Response: %s", section, missing_keys, section_json)
+        raise AnalysisResponseError(f"The AI response was incomplete (missing: {', '.join(missing_keys)}). Please try again.")
+    return section_json
+
+
+def _validate_analysis(analysis_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Schema-check the merged analysis, filling in defaults for anything missing."""
+    try:
+        # Fast path: a complete, well-formed response needs no repair. The schema's "integer"
+        # also accepts integral floats such as 85.0, so the score type is checked exactly.
+        try:
+            _VALIDATE_ANALYSIS(analysis_json)
+            if type(analysis_json["match_score"]) is int:
+                return analysis_json
+        except fastjsonschema.JsonSchemaException:
+            pass
+
+        keyword_analysis = analysis_json.get("keyword_analysis")
+        missing_keys = [key for key in ANALYSIS_KEYS if key not in analysis_json]
+        if keyword_analysis is not None and not (isinstance(keyword_analysis, dict) and "missing_jd_keywords" in keyword_analysis):
+             missing_keys.append("keyword_analysis.missing_jd_keywords")
+
+        if missing_keys:
+            logger.warning("Groq response JSON missing expected keys: %s. Response: %s", missing_keys, analysis_json)
+            st.warning(f"Analysis response might be incomplete. Missing fields: {', '.join(missing_keys)}")
+            for key in missing_keys:
+                if key in _DEFAULTS:
+                    analysis_json.setdefault(key, _DEFAULTS[key]())
+            if not isinstance(analysis_json["keyword_analysis"], dict):
+                analysis_json["keyword_analysis"] = {}
+            analysis_json["keyword_analysis"].setdefault("missing_jd_keywords", [])
+
+        score = analysis_json.get("match_score")
+        if type(score) is not int or not 0 <= score <= 100:
+            logger.warning("Match score %r is not an integer from 0 to 100. Setting to N/A.", score)
+            analysis_json["match_score"] = "N/A"
+
+        return analysis_json
+
+    except Exception as parse_e:
+        logger.error("Error processing AI response: %s. Response was: %s", parse_e, analysis_json, exc_info=True)
+        raise AnalysisResponseError(f"An error occurred while processing the AI response: {parse_e}") from parse_e
+
+
+def _analysis_cache_key(resume_text: str, job_description: str, model: str, section: str) -> str:
+    """Return a compact digest identifying one (resume, job description, model, section) analysis."""
+    return hashlib.blake2b(
+        resume_text.encode() + b'\0' + job_description.encode() + b'\0' + model.encode() + b'\0' + section.encode(),
+        digest_size=16
+    ).hexdigest()
+
+
+def start_resume_analysis(_client: "AsyncGroq", resume_text: str, job_description: str,
+                          previous_job: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Start analyzing resume against job description using Groq API, without waiting for it.
+
+    Cached sections are served immediately and the rest are streamed concurrently on the
+    background event loop. Returns the in-flight job: the section cache keys, the results so
+    far, one stream buffer per pending section, the last preview parse of each buffer and the
+    future of the pending requests. `previous_job` is kept and returned if it is still running
+    the same analysis, and cancelled otherwise.
+    """
     if not _client:
         st.error("Groq client not initialized.")
+        if previous_job is not None: cancel_analysis(previous_job)
         return None
 
     if len(resume_text) < MIN_RESUME_LENGTH or len(job_description) < MIN_JD_LENGTH:
          st.warning("Resume or Job Description text is too short for meaningful analysis.")
          logger.warning("Analysis skipped due to short input text.")
+         if previous_job is not None: cancel_analysis(previous_job)
          return None
 
-    # Prompt requesting JSON with specific keys
-    prompt = f"""
-    Analyze the following resume against the provided job description.
-    Provide a detailed, critical, and constructive analysis.
-
-    **Resume Text:**
-    ```text
-    {resume_text}
-    ```
-
-    **Job Description:**
-    ```text
-    {job_description}
-    ```
-
-    **Instructions:**
-    Respond ONLY with a valid JSON object. Do not include any text before or after the JSON object.
-    The JSON object must contain the following keys:
-    - "match_score": An integer score from 0 to 100 representing the overall alignment, considering skills, experience, keywords, and qualifications. Be realistic.
-    - "score_rationale": A brief string explaining the main reasons for the given match_score.
-    - "key_qualifications_match": A string summarizing how well the resume meets the *most critical* qualifications mentioned in the JD (use bullet points within the string, e.g., using markdown like '* Requirement: Matched/Partially Matched/Missing - Justification').
-    - "missing_skills_requirements": A list of strings detailing important skills, tools, technologies, certifications, or specific experiences mentioned in the JD but *clearly missing* or insufficiently detailed in the resume. Be specific.
-    - "strengths": A list of strings highlighting the resume's *most relevant* strengths for *this specific* job description (e.g., specific achievements, unique skill combinations, strong experience alignment).
-    - "areas_for_improvement": A list of strings suggesting specific, actionable areas where the resume could be improved to better match *this* JD (focus on content, clarity, impact).
-    - "suggested_resume_improvements": A list of strings providing concrete, actionable suggestions for *specific* changes or additions to the resume text. Examples: "Quantify achievement X by adding metrics like Y%", "Add keyword Z from the JD to the summary/skills", "Elaborate on project A experience focusing on B technology".
-    - "keyword_analysis": An object containing ONLY one list: "missing_jd_keywords" (important keywords from JD not found in resume). Keep the list concise (max 5-7 keywords).
-
-    Ensure all list values are strings. Ensure the entire output is a single, valid JSON object.
-    Example keyword_analysis: {{ "missing_jd_keywords": ["Data Visualization", "Agile Methodology", "Cloud Platform X"] }}
+    original_chars = len(resume_text) + len(job_description)
+    resume_text, resume_truncated = _compact_text(resume_text, MAX_RESUME_PROMPT_CHARS)
+    job_description, jd_truncated = _compact_text(job_description, MAX_JD_PROMPT_CHARS)
+    if resume_truncated or jd_truncated:
+        truncated = [name for name, flag in (("resume", resume_truncated), ("job description", jd_truncated)) if flag]
+        logger.warning("Truncated %s to fit the prompt size limits.", " and ".join(truncated))
+        st.info(f"The {' and '.join(truncated)} exceeded the analysis size limit, so only the first part was analyzed. "
+                "Content beyond that point may be reported as missing.")
+    logger.info("Prompt input compacted from ~%d to ~%d tokens.",
+                original_chars // 4, (len(resume_text) + len(job_description)) // 4)
+
+    cache, cache_lock = _analysis_cache()
+    section_keys = {section: _analysis_cache_key(resume_text, job_description, GROQ_MODEL, section)
+                    for section in ANALYSIS_SECTIONS}
+    if previous_job is not None:
+        if not analysis_done(previous_job) and previous_job["section_keys"] == section_keys:
+            logger.info("Identical analysis already in flight; keeping it instead of restarting.")
+            return previous_job
+        cancel_analysis(previous_job)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with cache_lock:
+        for section, cache_key in section_keys.items():
+            cached_section = cache.get(cache_key)
+            if cached_section is not None:
+                results[section] = cached_section
+    pending = [section for section in ANALYSIS_SECTIONS if section not in results]
+    logger.info("Analysis cache served %d of %d sections; requesting %s.", len(results), len(ANALYSIS_SECTIONS), pending)
+
+    buffers: Dict[str, List[str]] = {section: [] for section in pending}
+    future = None
+    if pending:
+        prompt = _build_prompt(resume_text, job_description)
+        future = _submit_async(_gather(*(
+            _request_section(_client, section, prompt, GROQ_MODEL, buffers[section],
+                             section_keys[section], cache, cache_lock)
+            for section in pending
+        )))
+    return {"section_keys": section_keys, "results": results, "buffers": buffers,
+            "previews": {}, "future": future, "start_time": time.time()}
+
+
+def analysis_done(job: Dict[str, Any]) -> bool:
+    """Return True once every pending request of an analysis job has finished."""
+    return job["future"] is None or job["future"].done()
+
+
+def cancel_analysis(job: Dict[str, Any]) -> None:
+    """Cancel the pending Groq requests of an analysis job that is no longer wanted."""
+    if job["future"] is not None and job["future"].cancel():
+        logger.info("Cancelled in-flight Groq analysis.")
+
+
+def finish_resume_analysis(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Collect and merge the sections of a finished analysis job, expecting JSON output.
+
+    Successful sections were already cached by their requests, even if another section failed.
     """
-
     try:
-        start_time = time.time()
-        logger.info(f"Sending request to Groq API with model {GROQ_MODEL}...")
-        response = _client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert ATS (Applicant Tracking System) and human recruiter resume analyzer. You provide critical, actionable feedback. Respond ONLY with the requested JSON object."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.4,
-            max_tokens=4096,
-        )
-        end_time = time.time()
-        api_duration = end_time - start_time
-        logger.info(f"Groq API response received in {api_duration:.2f} seconds.")
-
-        response_content = response.choices[0].message.content
-        logger.debug(f"Raw Groq response content start:\n{response_content[:500]}...")
-
-        # Robust JSON Parsing
-        try:
-            json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
-            if json_match:
-                json_string = json_match.group(0)
-                analysis_json = json.loads(json_string)
-                logger.info("Successfully parsed JSON response from Groq.")
-            else:
-                st.error("Could not find a valid JSON object in the AI response.")
-                logger.error(f"No JSON object found in Groq response. Raw response was:\n{response_content}")
-                return None
-
-            # Schema Validation
-            required_keys = ["match_score", "score_rationale", "key_qualifications_match",
-                             "missing_skills_requirements", "strengths", "areas_for_improvement",
-                             "suggested_resume_improvements", "keyword_analysis"]
-            missing_keys = [key for key in required_keys if key not in analysis_json]
-            if "keyword_analysis" in analysis_json and "missing_jd_keywords" not in analysis_json.get("keyword_analysis", {}): # Safer check
-                 missing_keys.append("keyword_analysis.missing_jd_keywords")
-                 if isinstance(analysis_json.get("keyword_analysis"), dict):
-                     analysis_json["keyword_analysis"]["missing_jd_keywords"] = []
-
-            if missing_keys:
-                logger.warning(f"Groq response JSON missing expected keys: {missing_keys}. Response: {analysis_json}")
-                st.warning(f"Analysis response might be incomplete. Missing fields: {', '.join(missing_keys)}")
-                for key in missing_keys:
-                    if key == "keyword_analysis.missing_jd_keywords":
-                        if "keyword_analysis" not in analysis_json: analysis_json["keyword_analysis"] = {}
-                        if "missing_jd_keywords" not in analysis_json["keyword_analysis"]: analysis_json["keyword_analysis"]["missing_jd_keywords"] = []
-                        continue
-                    if key == "keyword_analysis": analysis_json[key] = {"missing_jd_keywords": []}
-                    elif key in ["missing_skills_requirements", "strengths", "areas_for_improvement", "suggested_resume_improvements"]: analysis_json[key] = []
-                    else: analysis_json[key] = "N/A"
-
-            if not isinstance(analysis_json.get("match_score"), int):
-                logger.warning("Match score is not an integer. Setting to N/A.")
-                analysis_json["match_score"] = "N/A"
-
-            return analysis_json
-
-        except json.JSONDecodeError as json_e:
-            st.error(f"Failed to parse the analysis response from the AI. Please check the format or try again. Error: {json_e}")
-            logger.error(f"Failed to decode Groq response as JSON. Raw response was:\n{response_content}", exc_info=True)
-            return None
-        except Exception as parse_e:
-            st.error(f"An error occurred while processing the AI response: {parse_e}")
-            logger.error(f"Error processing AI response: {parse_e}. Raw response was:\n{response_content}", exc_info=True)
-            return None
-
+        results = job["results"]
+        if job["future"] is not None:
+            first_error: Optional[Exception] = None
+            for section, outcome in zip(job["buffers"], job["future"].result()):
+                if isinstance(outcome, Exception):
+                    first_error = first_error or outcome
+                else:
+                    results[section] = outcome
+            if first_error is not None:
+                raise first_error
+
+        analysis_json: Dict[str, Any] = {}
+        for section in ANALYSIS_SECTIONS:
+            analysis_json.update(results[section])
+        return _validate_analysis(analysis_json)
+    except AnalysisResponseError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"An error occurred during analysis with the Groq API: {e}")
         logger.exception("Error during Groq API call.")
@@ -219,13 +647,14 @@ def main():
     if not client:
         st.error("Groq client could not be initialized. Please ensure the GROQ_API_KEY is set correctly in your environment variables (.env file).")
         st.stop()
+    warm_up_groq(client)
 
     # Session State Initialization
-    if "resume_text" not in st.session_state: st.session_state.resume_text = None
+    if "resume_hash" not in st.session_state: st.session_state.resume_hash = None
     if "job_description" not in st.session_state: st.session_state.job_description = ""
     if "analysis_result" not in st.session_state: st.session_state.analysis_result = None
     if "analysis_requested" not in st.session_state: st.session_state.analysis_requested = False
-    if "last_upload_name" not in st.session_state: st.session_state.last_upload_name = None
+    if "analysis_job" not in st.session_state: st.session_state.analysis_job = None
 
     # --- Inputs Area ---
     # Using st.form to ensure inputs are submitted together with the button
@@ -241,10 +670,6 @@ def main():
                 key="resume_upload_widget", # Give it a specific key inside the form
                 help="Ensure your PDF contains selectable text."
             )
-            # Display extracted text status outside the form if available
-            if st.session_state.resume_text:
-                 with st.expander("View Extracted Resume Text"):
-                      st.text_area("Extracted Text", st.session_state.resume_text, height=150, disabled=True, key="resume_extracted_text_display_form")
 
         with col2:
             st.markdown("#### 2. Paste Job Description")
@@ -268,20 +693,26 @@ def main():
 
     # --- Process Inputs and Trigger Analysis ONLY on Form Submission ---
     if submit_button:
+        # A new submission supersedes any analysis still in flight, unless it asks for the same one
+        previous_job = st.session_state.analysis_job
+        st.session_state.analysis_job = None
+
         # --- Handle File Upload within Form Submission ---
+        # Only a digest of the PDF is kept in session state; the text itself lives in the extraction cache
+        resume_text = None
         if uploaded_file is not None:
-            # Check if it's a new file or the same one re-submitted
-            if uploaded_file.name != st.session_state.last_upload_name or st.session_state.resume_text is None:
-                 st.session_state.analysis_result = None # Clear old results
-                 st.session_state.analysis_requested = False
-                 st.session_state.last_upload_name = uploaded_file.name
-                 with st.spinner("Extracting text from PDF..."):
-                      bytes_data = uploaded_file.getvalue()
-                      st.session_state.resume_text = extract_text_from_pdf(io.BytesIO(bytes_data))
-                      if st.session_state.resume_text: st.success("Resume text extracted.")
-                      else: st.error("Failed to extract text from new PDF.")
-            # If same file re-submitted, resume_text should still be in session state
-        elif not st.session_state.resume_text: # No file uploaded and no text in session state
+            # Hash the uploader's own buffer in place rather than another copy of the PDF
+            with memoryview(uploaded_file.getbuffer()) as pdf_view:
+                 resume_hash = hashlib.blake2b(pdf_view).hexdigest()
+            # Re-submitting the same PDF (under any file name) is served from the extraction cache
+            with st.spinner("Extracting text from PDF..."):
+                 resume_text = _extract_text_cached(resume_hash, uploaded_file)
+            if resume_hash != st.session_state.resume_hash:
+                 if resume_text: st.success("Resume text extracted.")
+                 else: st.error("Failed to extract text from new PDF.")
+            st.session_state.resume_hash = resume_hash if resume_text else None
+        else:
+             st.session_state.resume_hash = None
              st.error("Please upload a resume PDF.")
 
 
@@ -294,7 +725,7 @@ def main():
 
         # Validate inputs *after* form submission
         valid_jd = len(st.session_state.job_description) >= MIN_JD_LENGTH
-        valid_resume = st.session_state.resume_text is not None and len(st.session_state.resume_text) >= MIN_RESUME_LENGTH
+        valid_resume = resume_text is not None and len(resume_text) >= MIN_RESUME_LENGTH
 
         if not valid_resume:
              st.error(f"Resume text missing or too short (needs > {MIN_RESUME_LENGTH} chars). Cannot analyze.")
@@ -302,18 +733,36 @@ def main():
              st.error(f"Job description is too short (needs > {MIN_JD_LENGTH} chars). Cannot analyze.")
 
         if valid_resume and valid_jd:
-            with st.spinner("🤖 Performing AI analysis via Groq... Please wait."):
-                analysis_start_time = time.time()
-                st.session_state.analysis_result = analyze_resume_groq(
-                    client,
-                    st.session_state.resume_text,
-                    st.session_state.job_description
-                )
-                analysis_end_time = time.time()
-                logger.info(f"Total analysis process time (including API call): {analysis_end_time - analysis_start_time:.2f} seconds")
+            # The Groq requests run on the background event loop; progress is polled below
+            st.session_state.analysis_job = start_resume_analysis(
+                client,
+                resume_text,
+                st.session_state.job_description,
+                previous_job=previous_job
+            )
         else:
              st.session_state.analysis_requested = False # Reset if validation failed
-
+             if previous_job is not None: cancel_analysis(previous_job)
+
+    # --- Extracted Resume Text (loaded from the extraction cache only when toggled on) ---
+    if st.session_state.resume_hash and uploaded_file is not None:
+        if st.toggle("View Extracted Resume Text", key="show_extracted"):
+            extracted_text = _extract_text_cached(st.session_state.resume_hash, uploaded_file) or ""
+            truncated = len(extracted_text) > EXTRACTED_PREVIEW_CHARS
+            st.markdown(f"```\n{extracted_text[:EXTRACTED_PREVIEW_CHARS]}{'...[truncated]' if truncated else ''}\n```")
+
+    # --- Poll In-Flight Analysis ---
+    # Rerun on a short interval until the job finishes, so the script thread never blocks on the network
+    job = st.session_state.analysis_job
+    if job is not None:
+        if not analysis_done(job):
+            with st.spinner("🤖 Performing AI analysis via Groq... Please wait."):
+                _render_partial_analysis(job)
+                time.sleep(ANALYSIS_POLL_SECONDS)
+            st.rerun()
+        st.session_state.analysis_job = None
+        st.session_state.analysis_result = finish_resume_analysis(job)
+        logger.info("Total analysis process time (including API call): %.2f seconds", time.time() - job["start_time"])
 
     # --- Display Analysis Results ---
     # Display results if analysis was successful (result is not None)
@@ -340,7 +789,7 @@ def main():
                 st.subheader("✅ Strengths")
                 strengths = results.get("strengths", [])
                 if strengths:
-                    for item in strengths: st.markdown(f"- {item}")
+                    st.markdown("\n".join(f"- {item}" for item in strengths))
                 else: st.info("_No specific strengths highlighted._")
             with st.container(border=True):
                 st.subheader("🔑 Keyword Analysis")
@@ -355,13 +804,13 @@ def main():
                  st.subheader("❌ Missing Skills/Requirements")
                  missing = results.get("missing_skills_requirements", [])
                  if missing:
-                      for item in missing: st.markdown(f"- {item}")
+                      st.markdown("\n".join(f"- {item}" for item in missing))
                  else: st.success("_No critical missing skills or requirements identified._")
              with st.container(border=True):
                 st.subheader("📉 Areas for Improvement")
                 areas = results.get("areas_for_improvement", [])
                 if areas:
-                    for item in areas: st.markdown(f"- {item}")
+                    st.markdown("\n".join(f"- {item}" for item in areas))
                 else: st.info("_No specific areas for improvement highlighted._")
 
         # Suggested Improvements (Full Width)
@@ -369,7 +818,7 @@ def main():
              st.subheader("💡 Suggested Resume Improvements")
              suggestions = results.get("suggested_resume_improvements", [])
              if suggestions:
-                  for item in suggestions: st.markdown(f"- {item}")
+                  st.markdown("\n".join(f"- {item}" for item in suggestions))
              else: st.info("_No specific suggestions provided._")
 
         # --- REMOVED Download Button ---